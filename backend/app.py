@@ -4,15 +4,30 @@ FastAPI application for Azure App Service deployment
 """
 
 import os
+import re
+import asyncio
+import hashlib
+import types
+import time
+import random
+import queue
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing import Dict, List, Optional
 import httpx
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder
 
 # Load environment variables
 load_dotenv()
@@ -25,18 +40,117 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="CSIRO Mentor API",
     description="RAG-powered AI Assistant for CSIRO",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Response compression
+class EventStreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip responses except server-sent event streams.
+
+    Compressed chunks are only emitted once zlib's buffer fills, which would
+    hold back streamed tokens, so text/event-stream responses pass through.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("Accept-Encoding", ""):
+            await self.app(scope, receive, send)
+            return
+        
+        responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+        responder.send = send
+        passthrough = False
+        
+        async def send_maybe_gzip(message):
+            nonlocal passthrough
+            if message["type"] == "http.response.start":
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                passthrough = content_type.startswith("text/event-stream")
+            if passthrough:
+                await send(message)
+            else:
+                await responder.send_with_gzip(message)
+        
+        await self.app(scope, receive, send_maybe_gzip)
+
+
+# Added before CORS so CORS stays the outermost middleware
+app.add_middleware(EventStreamAwareGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # CORS configuration
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "*").split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+_ALLOW_ALL_ORIGINS = "*" in (o.strip() for o in allowed_origins)
+_ALLOWED = frozenset(o.strip() for o in allowed_origins)
+_PREBUILT_CORS_HDRS = [
+    (b"access-control-allow-credentials", b"true"),
+    (b"vary", b"Origin"),
+]
+# Credentialed requests cannot use "*" for methods, so list them explicitly
+_PREBUILT_PREFLIGHT_HDRS = _PREBUILT_CORS_HDRS + [
+    (b"access-control-allow-methods", b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"),
+    (b"access-control-max-age", b"600"),
+]
+
+
+class AllowlistCORSMiddleware:
+    """CORS with a single set lookup per request and prebuilt response headers.
+
+    Allowed origins are echoed back (required with credentials); preflight
+    requests are answered directly and may use any request headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        origin = request_method = request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+        
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+        
+        allowed = _ALLOW_ALL_ORIGINS or origin.decode("latin-1") in _ALLOWED
+        
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            if not allowed:
+                await PlainTextResponse("Disallowed CORS origin", status_code=400)(scope, receive, send)
+                return
+            headers = [(b"access-control-allow-origin", origin), *_PREBUILT_PREFLIGHT_HDRS]
+            if request_headers is not None:
+                headers.append((b"access-control-allow-headers", request_headers))
+            response = PlainTextResponse("OK")
+            response.raw_headers.extend(headers)
+            await response(scope, receive, send)
+            return
+        
+        if not allowed:
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"access-control-allow-origin", origin),
+                    *_PREBUILT_CORS_HDRS
+                ]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_cors)
+
+
+app.add_middleware(AllowlistCORSMiddleware)
 
 # ============================================
 # SYSTEM PROMPT / CONTEXT CONFIGURATION
@@ -108,9 +222,59 @@ class Config:
     RAG_QUERY_TYPE = os.getenv("RAG_QUERY_TYPE", "simple")  # simple, semantic, vector (use simple if semantic not configured)
     RAG_STRICTNESS = int(os.getenv("RAG_STRICTNESS", "1"))    # 1-5, lower = more flexible
     RAG_IN_SCOPE = os.getenv("RAG_IN_SCOPE", "false").lower() == "true"  # false = can use general knowledge
+    
+    # Batch endpoint settings
+    MAX_BATCH_REQUESTS = int(os.getenv("MAX_BATCH_REQUESTS", "16"))     # chat requests accepted per batch call
+    
+    # Response cache settings
+    CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "1024"))
+    CACHE_TTL = int(os.getenv("CACHE_TTL", "600"))            # seconds
+    INDEX_VERSION = os.getenv("INDEX_VERSION", "")            # bump to invalidate cached RAG answers
+    
+    # Query batching settings
+    BATCH_SIZE = int(os.getenv("BATCH_SIZE", "8"))
+    BATCH_WAIT_MS = int(os.getenv("BATCH_WAIT_MS", "0"))      # opt-in wait for a batch to fill
+    
+    # Upstream resilience settings
+    RETRY_ATTEMPTS = max(1, int(os.getenv("RETRY_ATTEMPTS", "3")))          # total tries for 429/503
+    BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))            # consecutive failures before opening
+    BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))           # seconds to fail fast once open
 
 config = Config()
 
+# Request pieces that only depend on process-level configuration
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+_CHAT_URL = f"{config.AZURE_OPENAI_ENDPOINT}/openai/deployments/{config.AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={config.AZURE_OPENAI_API_VERSION}"
+
+_HEADERS = types.MappingProxyType({
+    "Content-Type": "application/json",
+    "api-key": config.AZURE_OPENAI_API_KEY
+})
+
+# Pre-serialised (and therefore immutable) Azure Search data source block
+_RAG_DATA_SOURCES = orjson.Fragment(orjson.dumps([
+    {
+        "type": "azure_search",
+        "parameters": {
+            "endpoint": config.AZURE_SEARCH_ENDPOINT,
+            "index_name": config.AZURE_SEARCH_INDEX,
+            "authentication": {
+                "type": "api_key",
+                "key": config.AZURE_SEARCH_API_KEY
+            },
+            # IMPROVED RAG SETTINGS
+            "query_type": config.RAG_QUERY_TYPE,      # semantic for better understanding
+            "strictness": config.RAG_STRICTNESS,       # 1 = most flexible
+            "in_scope": config.RAG_IN_SCOPE,           # false = can use general knowledge
+            "top_n_documents": config.TOP_N_DOCUMENTS,
+            
+            # Role information to help the model understand context
+            "role_information": "You are an AI assistant helping users with CSIRO research documents. If the retrieved documents don't contain relevant information, use your general knowledge to help the user while noting that you're providing general information."
+        }
+    }
+]))
+
 
 # ============================================
 # Request/Response Models
@@ -122,6 +286,7 @@ class Message(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[Message]
     use_rag: Optional[bool] = True
+    stream: Optional[bool] = False
 
 class Citation(BaseModel):
     content: Optional[str] = None
@@ -132,11 +297,240 @@ class ChatResponse(BaseModel):
     content: str
     citations: List[Citation] = []
 
+class BatchChatRequest(BaseModel):
+    # Each item is a paid upstream call, so cap the total per HTTP request
+    requests: List[ChatRequest] = Field(..., max_length=config.MAX_BATCH_REQUESTS)
+
 class HealthResponse(BaseModel):
     status: str
     environment: str
     rag_enabled: bool
 
+# Probe/config payloads never change at runtime, so serialise them once
+_HEALTH_BYTES = orjson.dumps({
+    "status": "healthy",
+    "environment": os.getenv("ENVIRONMENT", "development"),
+    "rag_enabled": config.ENABLE_RAG
+})
+
+_CONFIG_BYTES = orjson.dumps({
+    "rag_enabled": config.ENABLE_RAG,
+    "deployment": config.AZURE_OPENAI_DEPLOYMENT,
+    "search_index": config.AZURE_SEARCH_INDEX,
+    "query_type": config.RAG_QUERY_TYPE,
+    "strictness": config.RAG_STRICTNESS,
+    "in_scope": config.RAG_IN_SCOPE
+})
+
+# Validator built once and reused on the /api/chat hot path
+CHAT_REQUEST_ADAPTER = TypeAdapter(ChatRequest)
+
+
+# ============================================
+# Shared HTTP client
+# ============================================
+# One long-lived client per worker so connections (and TLS sessions) to
+# Azure OpenAI are pooled and reused instead of re-established per request.
+HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+# Responses for repeated conversations, keyed by _cache_key()
+RESPONSE_CACHE: TTLCache = TTLCache(maxsize=config.CACHE_MAX_SIZE, ttl=config.CACHE_TTL)
+CACHE_LOCK = asyncio.Lock()
+
+# Upstream calls currently in flight, keyed by _cache_key(); identical requests share one
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Upper bound on concurrent upstream calls issued by the batch endpoint
+SEM = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENCY", "32")))
+
+
+# ============================================
+# Query batching
+# ============================================
+class ChatBatcher:
+    """Coalesce incoming chat requests into small batches.
+
+    Requests already queued are dispatched together (up to BATCH_SIZE). With
+    BATCH_WAIT_MS > 0 the batcher also waits that long for more to arrive;
+    the default of 0 never delays a lone request, since each item is still
+    its own upstream call.
+    """
+
+    def __init__(self, batch_size: int, wait_ms: int):
+        self.batch_size = batch_size
+        self.wait = wait_ms / 1000
+        self.queue: "asyncio.Queue[tuple[ChatRequest, asyncio.Future]]" = asyncio.Queue()
+        self._tasks = set()
+
+    async def submit(self, request: ChatRequest) -> dict:
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, fut))
+        return await fut
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < self.batch_size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            
+            deadline = loop.time() + self.wait
+            while len(items) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Dispatch in the background so the next batch can start filling
+            task = asyncio.create_task(self._dispatch(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, items):
+        results = await asyncio.gather(*(_do_chat(r) for r, _ in items), return_exceptions=True)
+        for (_, fut), result in zip(items, results):
+            if fut.done():
+                # Caller went away (e.g. client disconnected)
+                continue
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+
+# Created in the startup hook so the queue belongs to the serving event loop
+BATCHER: Optional[ChatBatcher] = None
+BATCHER_TASK: Optional[asyncio.Task] = None
+LOG_LISTENER: Optional[QueueListener] = None
+
+
+# ============================================
+# Static files
+# ============================================
+# path -> (bytes, etag, media_type, full_path, mtime_ns); filled lazily, never evicted
+_STATIC_CACHE: dict = {}
+STATIC_CACHE_MAX_FILES = 256
+
+# Filenames carrying a content hash (e.g. app.3f2a9c1b.js) never change
+_HASHED_ASSET = re.compile(r"\.[0-9a-f]{8,}\.\w+$")
+
+# Frontend entry page, read once in the startup hook
+INDEX_HTML_BYTES: Optional[bytes] = None
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that keeps file contents in memory and serves content ETags.
+
+    Content-hashed files are served straight from memory; other files are
+    revalidated against their mtime so in-place edits are picked up.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        # Same method check StaticFiles does, applied before the cache is consulted
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        
+        entry = _STATIC_CACHE.get(path)
+        if entry is not None and not _HASHED_ASSET.search(path):
+            # Non-hashed files may be edited in place: a single stat catches that
+            try:
+                if os.stat(entry[3]).st_mtime_ns != entry[4]:
+                    entry = None
+            except OSError:
+                entry = None
+        
+        if entry is None:
+            _STATIC_CACHE.pop(path, None)
+            response = await super().get_response(path, scope)
+            if not isinstance(response, FileResponse) or response.status_code != 200:
+                return response
+            data = await run_in_threadpool(_read_bytes, response.path)
+            entry = (
+                data,
+                hashlib.blake2b(data, digest_size=8).hexdigest(),
+                response.media_type,
+                response.path,
+                response.stat_result.st_mtime_ns
+            )
+            if len(_STATIC_CACHE) < STATIC_CACHE_MAX_FILES:
+                _STATIC_CACHE[path] = entry
+        
+        data, etag, media_type = entry[:3]
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": "public, max-age=31536000, immutable" if _HASHED_ASSET.search(path) else "no-cache"
+        }
+        if Headers(scope=scope).get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        return Response(data, media_type=media_type, headers=headers)
+
+
+# ============================================
+# Lifecycle
+# ============================================
+async def _warm_connections():
+    """Open a pooled connection to Azure OpenAI so the first chat skips DNS/TCP/TLS setup"""
+    if not config.AZURE_OPENAI_ENDPOINT or not config.AZURE_OPENAI_API_KEY:
+        return
+    url = f"{config.AZURE_OPENAI_ENDPOINT}/openai/deployments/{config.AZURE_OPENAI_DEPLOYMENT}?api-version={config.AZURE_OPENAI_API_VERSION}"
+    try:
+        # Any status will do; only the established connection matters
+        await HTTP_CLIENT.get(url, headers={"api-key": config.AZURE_OPENAI_API_KEY}, timeout=5.0)
+    except httpx.HTTPError as e:
+        logger.warning("Connection warm-up to Azure OpenAI failed: %s", e)
+
+
+@app.on_event("startup")
+async def startup():
+    """Set up per-worker resources: log queue, warmed HTTP client, batcher and frontend"""
+    global HTTP_CLIENT, BATCHER, BATCHER_TASK, INDEX_HTML_BYTES, LOG_LISTENER
+    
+    # Log records are queued here and written to the original handlers from a background thread
+    root_logger = logging.getLogger()
+    handlers = root_logger.handlers[:]
+    for h in handlers:
+        root_logger.removeHandler(h)
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(QueueHandler(log_queue))
+    LOG_LISTENER = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    LOG_LISTENER.start()
+    
+    HTTP_CLIENT = httpx.AsyncClient(
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        http2=True,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+    )
+    await _warm_connections()
+    BATCHER = ChatBatcher(config.BATCH_SIZE, config.BATCH_WAIT_MS)
+    BATCHER_TASK = asyncio.create_task(BATCHER.run())
+    INDEX_HTML_BYTES = await run_in_threadpool(_read_bytes, "static/index.html")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the batcher, close the shared HTTP client and flush queued logs"""
+    if BATCHER_TASK is not None:
+        BATCHER_TASK.cancel()
+    if HTTP_CLIENT is not None:
+        await HTTP_CLIENT.aclose()
+    if LOG_LISTENER is not None:
+        LOG_LISTENER.stop()
+        # Hand logging back to the original handlers
+        root_logger = logging.getLogger()
+        for h in root_logger.handlers[:]:
+            if isinstance(h, QueueHandler):
+                root_logger.removeHandler(h)
+        for h in LOG_LISTENER.handlers:
+            root_logger.addHandler(h)
+
 
 # ============================================
 # API Endpoints
@@ -145,135 +539,311 @@ class HealthResponse(BaseModel):
 @app.get("/")
 async def root():
     """Serve the frontend"""
-    return FileResponse("static/index.html")
+    return HTMLResponse(INDEX_HTML_BYTES)
 
 
-@app.get("/health")
+@app.get("/health", response_class=Response, responses={200: {"model": HealthResponse}})
 async def health_check():
     """Health check endpoint for Azure App Service"""
-    return HealthResponse(
-        status="healthy",
-        environment=os.getenv("ENVIRONMENT", "development"),
-        rag_enabled=config.ENABLE_RAG
-    )
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 
-@app.get("/api/config")
+@app.get("/api/config", response_class=Response)
 async def get_config():
     """Get public configuration (no secrets)"""
-    return {
-        "rag_enabled": config.ENABLE_RAG,
-        "deployment": config.AZURE_OPENAI_DEPLOYMENT,
-        "search_index": config.AZURE_SEARCH_INDEX,
-        "query_type": config.RAG_QUERY_TYPE,
-        "strictness": config.RAG_STRICTNESS,
-        "in_scope": config.RAG_IN_SCOPE
+    return Response(content=_CONFIG_BYTES, media_type="application/json")
+
+
+# Circuit breaker state for the Azure OpenAI endpoint (per worker)
+_breaker = {"fails": 0, "open_until": 0.0}
+
+RETRYABLE_STATUS = (429, 503)
+MAX_RETRY_WAIT = 10.0
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After if given, else exponential backoff with jitter"""
+    retry_after = response.headers.get("retry-after")
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), MAX_RETRY_WAIT)
+        except ValueError:
+            pass
+    return min(4.0, 0.2 * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def _record_outcome(failed: bool):
+    """Update the circuit breaker after an upstream call"""
+    if not failed:
+        _breaker["fails"] = 0
+        return
+    _breaker["fails"] += 1
+    if _breaker["fails"] >= config.BREAKER_THRESHOLD:
+        _breaker["open_until"] = time.monotonic() + config.BREAKER_COOLDOWN
+        logger.warning("Circuit breaker open for %ss after %s consecutive failures", config.BREAKER_COOLDOWN, _breaker["fails"])
+
+
+async def _post_chat(body: dict, stream: bool = False) -> httpx.Response:
+    """POST a chat body to Azure OpenAI, retrying 429/503 and failing fast while the breaker is open"""
+    
+    if _breaker["open_until"] > time.monotonic():
+        raise HTTPException(status_code=503, detail="Azure OpenAI temporarily unavailable")
+    
+    content = orjson.dumps(body)
+    for attempt in range(config.RETRY_ATTEMPTS):
+        try:
+            response = await HTTP_CLIENT.send(
+                HTTP_CLIENT.build_request("POST", _CHAT_URL, headers=_HEADERS, content=content),
+                stream=stream
+            )
+        except httpx.TransportError:
+            _record_outcome(failed=True)
+            raise
+        
+        if response.status_code not in RETRYABLE_STATUS or attempt == config.RETRY_ATTEMPTS - 1:
+            break
+        if stream:
+            await response.aclose()
+        await asyncio.sleep(_retry_delay(response, attempt))
+    
+    _record_outcome(failed=response.status_code == 429 or response.status_code >= 500)
+    return response
+
+
+def _build_body(request: ChatRequest) -> dict:
+    """Build the Azure OpenAI request body for a conversation"""
+    
+    # System prompt first, then the user conversation
+    messages = [_SYSTEM_MSG, *({"role": m.role, "content": m.content} for m in request.messages)]
+    
+    # Build request body
+    body = {
+        "messages": messages,
+        "max_tokens": config.MAX_TOKENS,
+        "temperature": config.TEMPERATURE
     }
+    
+    # Add RAG data source if enabled
+    if request.use_rag and config.ENABLE_RAG and config.AZURE_SEARCH_ENDPOINT:
+        body["data_sources"] = _RAG_DATA_SOURCES
+    
+    return body
 
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Chat endpoint with RAG support"""
+def _hash_fields(h, *fields: str):
+    """Feed length-prefixed fields into a hash so field boundaries can't be forged"""
+    for field in fields:
+        data = field.encode()
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+
+
+def _blank_repeated_citations(citations: list) -> list:
+    """Drop the content of repeated chunks (same file and content), keeping every position.
+
+    The answer refers to sources by position ([doc1], [doc3], ...), so repeats
+    stay in place with only their (often large) content removed.
+    """
+    seen = set()
+    result = []
+    for c in citations:
+        h = hashlib.blake2b(digest_size=8)
+        _hash_fields(h, c.get("filepath") or "", c.get("content") or "")
+        key = h.digest()
+        content = c.get("content") if key not in seen else None
+        seen.add(key)
+        result.append({"content": content, "title": c.get("title"), "filepath": c.get("filepath")})
+    return result
+
+
+def _upstream_error(status_code: int, content: bytes) -> HTTPException:
+    """Turn a non-200 Azure OpenAI response into an HTTPException, tolerating non-JSON bodies"""
+    try:
+        error_data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # e.g. an HTML gateway error page
+        error_data = content[:500].decode("utf-8", "replace")
+    logger.error("Azure OpenAI error: %s", error_data)
+    
+    detail = "API Error"
+    if isinstance(error_data, dict) and isinstance(error_data.get("error"), dict):
+        detail = error_data["error"].get("message", detail)
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+async def _do_chat(request: ChatRequest) -> dict:
+    """Send one conversation to Azure OpenAI and build the response"""
     
     if not config.AZURE_OPENAI_ENDPOINT or not config.AZURE_OPENAI_API_KEY:
         raise HTTPException(status_code=500, detail="Azure OpenAI not configured")
     
     try:
-        # Build endpoint URL
-        url = f"{config.AZURE_OPENAI_ENDPOINT}/openai/deployments/{config.AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={config.AZURE_OPENAI_API_VERSION}"
+        body = _build_body(request)
         
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": config.AZURE_OPENAI_API_KEY
-        }
+        logger.info("Sending request to Azure OpenAI: %s", _CHAT_URL)
+        logger.info("RAG settings - query_type: %s, strictness: %s, in_scope: %s", config.RAG_QUERY_TYPE, config.RAG_STRICTNESS, config.RAG_IN_SCOPE)
         
-        # Build messages with system prompt
-        messages = []
+        response = await _post_chat(body)
         
-        # Add system prompt as first message
-        messages.append({
-            "role": "system",
-            "content": SYSTEM_PROMPT
-        })
+        if response.status_code != 200:
+            raise _upstream_error(response.status_code, response.content)
         
-        # Add user conversation messages
-        for m in request.messages:
-            messages.append({"role": m.role, "content": m.content})
+        # Only the first choice's message is used; the rest of the document is dropped here
+        message = orjson.loads(response.content)["choices"][0]["message"]
         
-        # Build request body
-        body = {
-            "messages": messages,
-            "max_tokens": config.MAX_TOKENS,
-            "temperature": config.TEMPERATURE
-        }
-        
-        # Add RAG data source if enabled
-        if request.use_rag and config.ENABLE_RAG and config.AZURE_SEARCH_ENDPOINT:
-            body["data_sources"] = [
-                {
-                    "type": "azure_search",
-                    "parameters": {
-                        "endpoint": config.AZURE_SEARCH_ENDPOINT,
-                        "index_name": config.AZURE_SEARCH_INDEX,
-                        "authentication": {
-                            "type": "api_key",
-                            "key": config.AZURE_SEARCH_API_KEY
-                        },
-                        # IMPROVED RAG SETTINGS
-                        "query_type": config.RAG_QUERY_TYPE,      # semantic for better understanding
-                        "strictness": config.RAG_STRICTNESS,       # 1 = most flexible
-                        "in_scope": config.RAG_IN_SCOPE,           # false = can use general knowledge
-                        "top_n_documents": config.TOP_N_DOCUMENTS,
-                        
-                        # Role information to help the model understand context
-                        "role_information": "You are an AI assistant helping users with CSIRO research documents. If the retrieved documents don't contain relevant information, use your general knowledge to help the user while noting that you're providing general information."
-                    }
-                }
-            ]
-        
-        logger.info(f"Sending request to Azure OpenAI: {url}")
-        logger.info(f"RAG settings - query_type: {config.RAG_QUERY_TYPE}, strictness: {config.RAG_STRICTNESS}, in_scope: {config.RAG_IN_SCOPE}")
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(url, headers=headers, json=body)
-            
-            if response.status_code != 200:
-                error_data = response.json()
-                logger.error(f"Azure OpenAI error: {error_data}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_data.get("error", {}).get("message", "API Error")
-                )
-            
-            data = response.json()
-            
         # Extract response
-        assistant_message = data["choices"][0]["message"]["content"]
+        assistant_message = message["content"]
         
         # Extract citations if available
         citations = []
-        if "context" in data["choices"][0]["message"]:
-            for c in data["choices"][0]["message"]["context"].get("citations", []):
-                citations.append(Citation(
-                    content=c.get("content"),
-                    title=c.get("title"),
-                    filepath=c.get("filepath")
-                ))
+        if "context" in message:
+            citations = _blank_repeated_citations(message["context"].get("citations", []))
         
-        return ChatResponse(content=assistant_message, citations=citations)
+        # Plain dict in the ChatResponse shape; built from trusted fields, so not re-validated
+        return {"content": assistant_message, "citations": citations}
         
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Request timeout")
     except Exception as e:
-        logger.error(f"Chat error: {str(e)}")
+        logger.error("Chat error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _stream_chat(request: ChatRequest) -> StreamingResponse:
+    """Relay Azure OpenAI's server-sent events to the client as they arrive"""
+    
+    if not config.AZURE_OPENAI_ENDPOINT or not config.AZURE_OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="Azure OpenAI not configured")
+    
+    body = _build_body(request)
+    body["stream"] = True
+    
+    try:
+        response = await _post_chat(body, stream=True)
+        
+        if response.status_code != 200:
+            try:
+                content = await response.aread()
+            finally:
+                await response.aclose()
+            raise _upstream_error(response.status_code, content)
+        
+    except HTTPException:
+        raise
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Request timeout")
+    except Exception as e:
+        logger.error("Chat error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # The upstream response is closed once the client has been sent everything
+    return StreamingResponse(
+        response.aiter_bytes(),
+        media_type="text/event-stream",
+        background=BackgroundTask(response.aclose)
+    )
+
+
+def _cache_key(request: ChatRequest) -> str:
+    """Content hash of everything that determines the upstream answer"""
+    h = hashlib.blake2b(digest_size=16)
+    _hash_fields(h, str(request.use_rag), str(config.TEMPERATURE), str(config.MAX_TOKENS), config.INDEX_VERSION)
+    for m in request.messages:
+        _hash_fields(h, m.role, m.content)
+    return h.hexdigest()
+
+
+async def _coalesced(key: str, request: ChatRequest) -> dict:
+    """Share one upstream call between identical requests that overlap in time"""
+    # No await between lookup and insert, so this is race-free on the event loop
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(BATCHER.submit(request))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shielded so one client disconnecting doesn't cancel the call for the others
+    return await asyncio.shield(task)
+
+
+@app.post(
+    "/api/chat",
+    responses={200: {"model": ChatResponse}},
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/ChatRequest"}}}
+        }
+    }
+)
+async def chat(http_request: Request):
+    """Chat endpoint with RAG support"""
+    
+    # Validate the raw body in one pass instead of FastAPI's per-field body handling
+    try:
+        request = CHAT_REQUEST_ADAPTER.validate_json(await http_request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
+    
+    if request.stream:
+        return await _stream_chat(request)
+    
+    key = _cache_key(request)
+    
+    # Only deterministic answers are cached unless the client opts in
+    use_cache = config.TEMPERATURE == 0 or http_request.headers.get("x-cache") == "1"
+    if use_cache:
+        async with CACHE_LOCK:
+            cached = RESPONSE_CACHE.get(key)
+        if cached is not None:
+            return ORJSONResponse(cached)
+    
+    payload = await _coalesced(key, request)
+    if use_cache:
+        async with CACHE_LOCK:
+            RESPONSE_CACHE[key] = payload
+    
+    # Returned ready-encoded, skipping FastAPI's jsonable_encoder pass
+    return ORJSONResponse(payload)
+
+
+@app.post("/api/chat/batch")
+async def chat_batch(batch: BatchChatRequest):
+    """Run several chat requests concurrently, preserving input order"""
+    
+    async def guarded(r: ChatRequest) -> dict:
+        async with SEM:
+            return await _do_chat(r)
+    
+    results = await asyncio.gather(*(guarded(r) for r in batch.requests), return_exceptions=True)
+    
+    # Failed items are reported in place rather than failing the whole batch
+    return [
+        {"error": r.detail if isinstance(r, HTTPException) else str(r)}
+        if isinstance(r, BaseException) else r
+        for r in results
+    ]
+
+
 # Mount static files (must be after API routes)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Import-string form so each worker imports the app (and runs the startup
+    # hook) in its own process
+    uvicorn.run(
+        "backend.app:app",
+        app_dir=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2)),
+        log_level=os.getenv("LOG_LEVEL", "info").lower()
+    )